@@ -0,0 +1,94 @@
+"""Grid occupancy packed into Python ints.
+
+Bit y * stride + x stands for cell (x, y). Each row carries one extra guard
+bit that is never set, so shifting left or right by one cannot wrap a cell
+onto the neighbouring row once the result is masked with BitGrid.full.
+"""
+
+# Passes between checks of a limited flood fill's size
+FILL_LIMIT_CHECK = 4
+
+if hasattr(int, "bit_count"):
+    popcount = int.bit_count
+else:
+    def popcount(bits):
+        return bin(bits).count("1")
+
+
+class BitGrid:
+    """Geometry for width x height bitboards; the boards themselves are plain ints"""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.stride = width + 1
+        row = (1 << width) - 1
+        full = 0
+        for y in range(height):
+            full |= row << (y * self.stride)
+        self.full = full
+
+    def contains(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def bit(self, x, y):
+        return 1 << (y * self.stride + x)
+
+    def test(self, bits, x, y):
+        """True if (x, y) is set; cells off the grid are never set"""
+        return 0 <= x < self.width and 0 <= y < self.height and bits >> (y * self.stride + x) & 1 == 1
+
+    def from_cells(self, cells):
+        bits = 0
+        for x, y in cells:
+            bits |= 1 << (y * self.stride + x)
+        return bits
+
+    def cells(self, bits):
+        """Expand a bitboard back into (x, y) cells, lowest bit first"""
+        cells = []
+        while bits:
+            low = bits & -bits
+            index = low.bit_length() - 1
+            cells.append((index % self.stride, index // self.stride))
+            bits ^= low
+        return cells
+
+    def neighbours(self, bits):
+        """Every cell orthogonally adjacent to a set cell"""
+        stride = self.stride
+        return ((bits << 1) | (bits >> 1) | (bits << stride) | (bits >> stride)) & self.full
+
+    def flood_fill(self, seed, free, limit=None):
+        """Grow seed through free cells; returns the reachable region (seed included).
+
+        Each pass grows the region by one cell in every direction, so a fill
+        takes as many passes as the longest free path from seed, and that can
+        be most of the board in a corridor. With a limit, stop once the region
+        holds at least limit cells; it may then be only part of what is reachable.
+        """
+        stride = self.stride
+        # Guard bits are not free, so masking with free alone keeps rows from wrapping
+        free &= self.full
+        region = seed
+        passes = 0
+        while True:
+            grown = region | (((region << 1) | (region >> 1) | (region << stride) | (region >> stride)) & free)
+            if grown == region:
+                return region
+            region = grown
+            passes += 1
+            if limit is not None and passes % FILL_LIMIT_CHECK == 0 and popcount(region) >= limit:
+                return region
+
+    def reachable_area(self, x, y, occupied, limit=None):
+        """Number of free cells reachable from (x, y), which itself may be occupied.
+
+        With a limit the count stops at limit, which is all a "does the snake
+        fit in there" check needs.
+        """
+        free = self.full & ~occupied
+        # The seed may be occupied, so the region needs one cell more than the limit
+        region = self.flood_fill(self.bit(x, y), free, None if limit is None else limit + 1)
+        area = popcount(region & free)
+        return area if limit is None else min(area, limit)
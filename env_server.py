@@ -0,0 +1,318 @@
+"""Shared-memory environment server for training agents in other processes.
+
+One server process steps many headless games (game_state.GameState, the
+Game.update rules) and keeps everything a trainer needs in a single
+multiprocessing.shared_memory block:
+
+    observations  uint8   (n_envs, height, width)  0 empty, 1 body, 2 head, 3 food
+    rewards       float32 (n_envs,)                +1 per food, -1 on death
+    dones         uint8   (n_envs,)
+    scores        int32   (n_envs,)                score before any auto-reset
+    actions       int8    (n_envs,)                0 keep going, 1 up, 2 down, 3 left, 4 right
+                                                   (anything else also keeps going)
+    sequence      int64   (n_clients, 2)           [request, response] per client
+    server        int64   (2,)                     [pid, status] of the server process
+
+Envs are split into equal contiguous slices, one per client. A client
+writes its actions, then bumps its request counter; the server sees the new
+request, steps that slice, writes the results and copies the request number
+into the response counter. Each counter has exactly one writer, so no locks
+are needed, and nothing is pickled per step: both sides work on NumPy views
+of the same memory. Finished games are reset straight away, so observations
+always show a live game. A client waiting for an answer gives up with
+ConnectionError once the server has stopped, crashed or been killed.
+"""
+
+import multiprocessing
+import os
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from game_state import DIRECTIONS, Board, GameState, SplitMix64
+
+EMPTY = 0
+BODY = 1
+HEAD = 2
+FOOD = 3
+
+FOOD_REWARD = 1.0
+DEATH_REWARD = -1.0
+
+REQUEST = 0
+RESPONSE = 1
+
+# Server status word
+PID = 0
+STATUS = 1
+STARTING = 0
+RUNNING = 1
+STOPPED = 2
+
+# Seconds between a waiting client's checks that the server is still there
+SERVER_CHECK_INTERVAL = 0.1
+
+
+def _layout(n_envs, n_clients, width, height):
+    """Offsets of each array inside the shared block, plus the total size"""
+    fields = [
+        ("sequence", np.int64, (n_clients, 2)),
+        ("server", np.int64, (2,)),
+        ("observations", np.uint8, (n_envs, height, width)),
+        ("rewards", np.float32, (n_envs,)),
+        ("scores", np.int32, (n_envs,)),
+        ("dones", np.uint8, (n_envs,)),
+        ("actions", np.int8, (n_envs,)),
+    ]
+    layout = {}
+    offset = 0
+    for name, dtype, shape in fields:
+        # Keep every array 64-byte aligned
+        offset = (offset + 63) // 64 * 64
+        layout[name] = (offset, dtype, shape)
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return layout, offset
+
+
+def _views(buffer, layout):
+    return {name: np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+            for name, (offset, dtype, shape) in layout.items()}
+
+
+def _attach(spec):
+    shm = shared_memory.SharedMemory(name=spec["name"])
+    # Processes started from the owner share its resource tracker. Any other
+    # process has its own, which would unlink the block when that process exits.
+    parent = multiprocessing.parent_process()
+    if spec["owner"] != os.getpid() and (parent is None or parent.pid != spec["owner"]):
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class EnvServer:
+    """Owns the shared block and the simulator process"""
+
+    def __init__(self, n_envs, n_clients=1, board=None, seed=0):
+        if n_envs % n_clients:
+            raise ValueError("n_envs must be a multiple of n_clients")
+        self.board = board if board is not None else Board()
+        self.spec = {
+            "n_envs": n_envs,
+            "n_clients": n_clients,
+            "width": self.board.width,
+            "height": self.board.height,
+            "owner": os.getpid(),
+        }
+        layout, size = _layout(n_envs, n_clients, self.board.width, self.board.height)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.spec["name"] = self.shm.name
+        views = _views(self.shm.buf, layout)
+        views["sequence"][:] = 0
+        views["server"][:] = (0, STARTING)
+        del views
+
+        self._stop = multiprocessing.Event()
+        self.process = multiprocessing.Process(
+            target=serve, args=(self.spec, self.board, seed, self._stop), name="snake-env-server", daemon=True)
+
+    def start(self):
+        self.process.start()
+
+    def close(self):
+        self._stop.set()
+        self.process.join()
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _process_running(pid):
+    """Best-effort check that pid is a live process; assumes it is where it cannot tell"""
+    # Signal 0 only probes on POSIX; on Windows os.kill would send a CTRL_C_EVENT
+    if os.name != "posix":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    # A killed server stays a zombie until its owner reaps it; Linux shows that in /proc
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            return stat.read().rpartition(")")[2].split()[0] != "Z"
+    except OSError:
+        return True
+
+
+class EnvClient:
+    """Trainer side: NumPy views of one client's slice of the shared block"""
+
+    def __init__(self, spec, client=0):
+        self.client = client
+        self.owner = spec["owner"]
+        self.shm = _attach(spec)
+        layout, _ = _layout(spec["n_envs"], spec["n_clients"], spec["width"], spec["height"])
+        views = _views(self.shm.buf, layout)
+
+        per_client = spec["n_envs"] // spec["n_clients"]
+        envs = slice(client * per_client, (client + 1) * per_client)
+        self.sequence = views["sequence"][client]
+        self.server = views["server"]
+        self.observations = views["observations"][envs]
+        self.rewards = views["rewards"][envs]
+        self.scores = views["scores"][envs]
+        self.dones = views["dones"][envs]
+        self.actions = views["actions"][envs]
+
+    def step(self, actions=None, timeout=None):
+        """Submit actions (or whatever is already in self.actions) and wait for the results.
+
+        Returns (observations, rewards, dones); these are live views that the
+        next step overwrites, so copy anything you want to keep.
+        """
+        if actions is not None:
+            self.actions[:] = actions
+        request = int(self.sequence[REQUEST]) + 1
+        self.sequence[REQUEST] = request
+
+        now = time.perf_counter()
+        deadline = None if timeout is None else now + timeout
+        next_check = now + SERVER_CHECK_INTERVAL
+        while self.sequence[RESPONSE] != request:
+            now = time.perf_counter()
+            if deadline is not None and now > deadline:
+                raise TimeoutError("environment server did not answer")
+            if now > next_check:
+                if not self.server_alive():
+                    raise ConnectionError("environment server has exited")
+                next_check = now + SERVER_CHECK_INTERVAL
+            time.sleep(0)
+        return self.observations, self.rewards, self.dones
+
+    def server_alive(self):
+        """False once the server has stopped, or its process is gone (e.g. killed)"""
+        pid, status = (int(value) for value in self.server)
+        if status == STOPPED:
+            return False
+        if not pid:
+            return True
+        if self.owner == os.getpid():
+            # The server is our child: a killed one lingers as a zombie until active_children() reaps it
+            return any(child.pid == pid for child in multiprocessing.active_children())
+        return _process_running(pid)
+
+    def close(self):
+        # Drop the views before closing, or the buffer is still exported
+        self.sequence = self.server = None
+        self.observations = self.rewards = self.scores = self.dones = self.actions = None
+        self.shm.close()
+
+
+class _Slot:
+    """Server-side bookkeeping for one game"""
+
+    __slots__ = ("state", "rng")
+
+    def __init__(self, board, seed):
+        self.rng = SplitMix64(seed)
+        self.state = GameState(board, rng=self.rng)
+
+
+def _draw(observation, state):
+    board = state.board
+    observation[:] = EMPTY
+    for x, y in state.body():
+        observation[y - board.top, x - board.left] = BODY
+    head = state.head
+    observation[head[1] - board.top, head[0] - board.left] = HEAD
+    _draw_food(observation, state)
+
+
+def _draw_food(observation, state):
+    board = state.board
+    x, y = state.food
+    # Food.generate_position can pick a cell just past the wall, which has no pixel here
+    if not board.is_wall((x, y)):
+        observation[y - board.top, x - board.left] = FOOD
+
+
+def _step_slot(slot, action, observation):
+    """Step one game and patch only the observation cells that changed"""
+    state = slot.state
+    board = state.board
+    left, top = board.left, board.top
+    old_head = state.head
+    old_tail = state.tail
+    old_length = state.length
+    old_score = state.score
+
+    # Anything outside 1-4 keeps going, like 0, rather than taking the server down
+    state.step(DIRECTIONS[action - 1] if 0 < action <= len(DIRECTIONS) else None)
+
+    if state.game_over:
+        reward = (state.score - old_score) / 10 * FOOD_REWARD + DEATH_REWARD
+        score = state.score
+        slot.state = GameState(board, rng=slot.rng)
+        _draw(observation, slot.state)
+        return reward, 1, score
+
+    # Old head first: for a one-cell snake it is also the tail that just left
+    observation[old_head[1] - top, old_head[0] - left] = BODY
+    if state.length == old_length:
+        observation[old_tail[1] - top, old_tail[0] - left] = EMPTY
+    head = state.head
+    observation[head[1] - top, head[0] - left] = HEAD
+    # Always redraw the food: the first food can sit under the starting head, and the tail just cleared it
+    _draw_food(observation, state)
+    return (state.score - old_score) / 10 * FOOD_REWARD, 0, state.score
+
+
+def serve(spec, board, seed, stop):
+    """Server process main loop: answer every client request until stop is set"""
+    shm = _attach(spec)
+    layout, _ = _layout(spec["n_envs"], spec["n_clients"], spec["width"], spec["height"])
+    views = _views(shm.buf, layout)
+    server = views["server"]
+    sequence = views["sequence"]
+    observations = views["observations"]
+    rewards = views["rewards"]
+    scores = views["scores"]
+    dones = views["dones"]
+    actions = views["actions"]
+    server[PID] = os.getpid()
+
+    try:
+        slots = [_Slot(board, seed + i) for i in range(spec["n_envs"])]
+        for i, slot in enumerate(slots):
+            _draw(observations[i], slot.state)
+        rewards[:] = 0
+        dones[:] = 0
+        scores[:] = 0
+        server[STATUS] = RUNNING
+
+        per_client = spec["n_envs"] // spec["n_clients"]
+        idle = 0
+        while not stop.is_set():
+            served = False
+            for client in range(spec["n_clients"]):
+                request = int(sequence[client, REQUEST])
+                if request == sequence[client, RESPONSE]:
+                    continue
+                start = client * per_client
+                for i in range(start, start + per_client):
+                    rewards[i], dones[i], scores[i] = _step_slot(slots[i], int(actions[i]), observations[i])
+                sequence[client, RESPONSE] = request
+                served = True
+
+            if served:
+                idle = 0
+            else:
+                # Spin while trainers are busy, back off when they go quiet
+                idle += 1
+                time.sleep(0 if idle < 1000 else 0.001)
+    finally:
+        # Stopped or crashed, waiting clients should stop waiting
+        server[STATUS] = STOPPED
+        del server, sequence, observations, rewards, scores, dones, actions, views
+        shm.close()
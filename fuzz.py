@@ -0,0 +1,393 @@
+"""Differential fuzzing of the fast engines against the reference game rules.
+
+Every case replays one seeded action sequence through the reference
+Snake/Food/Game.update code from snake_game.py and through each optimized
+engine in lockstep, comparing head, body, score, food and game over after
+every tick. Each case also steps an env_server slot with random actions,
+through its automatic resets, and checks the incrementally patched
+observation against a full redraw. A tick's action is a tuple of key presses (usually zero or one,
+sometimes two to try quick reversals), applied with change_direction
+before the update, just like several KEYDOWN events within one frame.
+
+Failing cases are shrunk to a minimal replay and printed as JSON lines:
+
+    python fuzz.py --cases 200000 --workers 8
+    python fuzz.py --replay '{"seed": 3, "actions": [[[0, -1]], [], ...]}'
+
+The exit status is 1 if any engine diverged, so a sweep can gate a release.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import time
+
+# The reference module sets up a display and mixer at import; keep it headless
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np  # noqa: E402
+
+import env_server  # noqa: E402
+import snake_game  # noqa: E402
+from game_state import DIRECTIONS, Board, GameState  # noqa: E402
+from rle_body import CompactSnake  # noqa: E402
+
+BOARD = Board(snake_game.GAME_WIDTH, snake_game.GAME_HEIGHT, snake_game.CELL_SIZE, snake_game.BORDER_WIDTH)
+CELL = snake_game.CELL_SIZE
+
+STRATEGIES = ("random", "chase", "reverse", "walls", "coil")
+
+
+class _Random(random.Random):
+    """random.Random that GameState.clone can copy"""
+
+    def clone(self):
+        other = _Random()
+        other.setstate(self.getstate())
+        return other
+
+
+class _Silent:
+    def play(self):
+        pass
+
+
+class ReferenceEngine:
+    """The untouched rules: Snake, Food and Game.update on a stand-in game object"""
+
+    name = "reference"
+
+    def __init__(self, seed):
+        random.seed(seed)
+        self.snake = snake_game.Snake()
+        self.food = snake_game.Food()
+        self.score = 0
+        self.game_over = False
+        self.game_state = "playing"
+        self.autopilot_enabled = False
+        self.eat_sound = _Silent()
+        self.game_over_sound = _Silent()
+
+    def record_score(self):
+        pass
+
+    def step(self, presses):
+        for dx, dy in presses:
+            self.snake.change_direction((dx * CELL, dy * CELL))
+        snake_game.Game.update(self)
+
+    def snapshot(self):
+        body = tuple((x // CELL, y // CELL) for x, y in self.snake.positions)
+        food = (self.food.position[0] // CELL, self.food.position[1] // CELL)
+        return body[0], body, self.score, food, self.game_over
+
+
+class GameStateEngine:
+    name = "game_state"
+
+    def __init__(self, seed):
+        self.state = GameState(BOARD, rng=_Random(seed))
+
+    def step(self, presses):
+        for direction in presses:
+            self.state.change_direction(direction)
+        self.state.step()
+
+    def snapshot(self):
+        state = self.state
+        return state.head, tuple(state.body()), state.score, state.food, state.game_over
+
+
+class GameStateCloneEngine(GameStateEngine):
+    """GameState stepped through fresh clones, with a sibling clone racing ahead each tick"""
+
+    name = "game_state_clones"
+
+    def __init__(self, seed):
+        super().__init__(seed)
+        self.sibling_random = random.Random(~seed)
+
+    def step(self, presses):
+        # Stepping a sibling first takes the shared trail away from the state we keep
+        sibling = self.state.clone()
+        sibling.step(self.sibling_random.choice(DIRECTIONS))
+        state = self.state.clone()
+        for direction in presses:
+            state.change_direction(direction)
+        state.step()
+        self.state = state
+
+
+class CompactEngine:
+    """CompactSnake with the food and scoring steps of Game.update around it"""
+
+    name = "compact"
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.snake = CompactSnake(BOARD)
+        self.food = BOARD.random_food(self.rng)
+        self.score = 0
+        self.game_over = False
+
+    def step(self, presses):
+        if self.game_over:
+            return
+        for direction in presses:
+            self.snake.change_direction(direction)
+        self.snake.move()
+        body = self.snake.body
+        if body.head == self.food:
+            self.score += 10
+            self.snake.grow = True
+            self.food = BOARD.random_food(self.rng)
+            while self.food == body.head or self.food in body:
+                self.food = BOARD.random_food(self.rng)
+        if self.snake.check_collision():
+            self.game_over = True
+
+    def snapshot(self):
+        body = tuple(self.snake.body.cells())
+        return body[0], body, self.score, self.food, self.game_over
+
+
+ENGINES = {engine.name: engine for engine in (GameStateEngine, GameStateCloneEngine, CompactEngine)}
+FIELDS = ("head", "body", "score", "food", "game_over")
+# Not a rules engine: checks env_server's observation patching against _draw
+OBSERVATIONS = "env_server"
+
+
+def choose_presses(strategy, rng, snapshot, direction):
+    """Pick this tick's key presses from the reference snapshot"""
+    head, body, _, food, _ = snapshot
+    if strategy == "random" or rng.random() < 0.1:
+        roll = rng.random()
+        if roll < 0.5:
+            return ()
+        if roll < 0.9:
+            return (rng.choice(DIRECTIONS),)
+        return (rng.choice(DIRECTIONS), rng.choice(DIRECTIONS))
+
+    if strategy == "reverse":
+        # Turn and turn again in one frame, which ends up facing backwards
+        dx, dy = direction
+        sideways = (dy, dx) if rng.random() < 0.5 else (-dy, -dx)
+        return (sideways, (-dx, -dy)) if rng.random() < 0.3 else ()
+
+    if strategy == "walls":
+        # Head for whichever wall (or the spawnable column/row past it) is closest, then slide along it
+        targets = [(BOARD.left - 1, head[1]), (BOARD.right, head[1]), (head[0], BOARD.top - 1), (head[0], BOARD.bottom)]
+        if rng.random() < 0.3:
+            food = rng.choice(targets)
+        else:
+            food = min(targets, key=lambda cell: abs(cell[0] - head[0]) + abs(cell[1] - head[1]))
+
+    occupied = set(body[1:-1])
+    moves = [d for d in DIRECTIONS if d != (-direction[0], -direction[1])]
+    safe = [d for d in moves
+            if (head[0] + d[0], head[1] + d[1]) not in occupied and not BOARD.is_wall((head[0] + d[0], head[1] + d[1]))]
+    if strategy == "coil" and len(body) > 2 and rng.random() < 0.7:
+        # Hug the tail: the cell it leaves this tick is only free if the snake is not growing
+        tail = body[-1]
+        for d in safe:
+            if abs(head[0] + d[0] - tail[0]) + abs(head[1] + d[1] - tail[1]) <= 1:
+                return (d,)
+    # Wall runs may steer straight into the wall; everything else stays alive if it can
+    candidates = moves if strategy == "walls" else safe
+    towards = [d for d in candidates
+               if abs(head[0] + d[0] - food[0]) + abs(head[1] + d[1] - food[1]) <
+               abs(head[0] - food[0]) + abs(head[1] - food[1])]
+    if towards:
+        return (rng.choice(towards),)
+    return (rng.choice(safe),) if safe else (rng.choice(moves),)
+
+
+def replay(seed, actions, engines):
+    """Run a fixed action list; returns (tick, engine name, differing fields) or None"""
+    reference = ReferenceEngine(seed)
+    others = [ENGINES[name](seed) for name in engines]
+    for tick, presses in enumerate(actions):
+        reference.step(presses)
+        expected = reference.snapshot()
+        for engine in others:
+            engine.step(presses)
+            divergence = _compare(expected, engine.snapshot())
+            if divergence:
+                return tick, engine.name, divergence
+    return None
+
+
+def _compare(expected, actual):
+    return [field for field, a, b in zip(FIELDS, expected, actual) if a != b]
+
+
+def generate(seed, strategy, ticks, engines):
+    """Play one case, choosing presses online; returns (actions, failure or None)"""
+    rng = random.Random(seed * 7919 + STRATEGIES.index(strategy))
+    reference = ReferenceEngine(seed)
+    others = [ENGINES[name](seed) for name in engines]
+    actions = []
+    for tick in range(ticks):
+        snapshot = reference.snapshot()
+        if snapshot[4]:
+            break
+        direction = (reference.snake.direction[0] // CELL, reference.snake.direction[1] // CELL)
+        presses = choose_presses(strategy, rng, snapshot, direction)
+        actions.append(presses)
+        reference.step(presses)
+        expected = reference.snapshot()
+        for engine in others:
+            engine.step(presses)
+            divergence = _compare(expected, engine.snapshot())
+            if divergence:
+                return actions, (tick, engine.name, divergence)
+    return actions, None
+
+
+def check_observations(seed, ticks):
+    """Step a seeded env_server slot with random actions; returns (tick, cells) of the first stale observation or None"""
+    rng = random.Random(seed)
+    slot = env_server._Slot(BOARD, seed)
+    observation = np.zeros((BOARD.height, BOARD.width), dtype=np.uint8)
+    redrawn = np.zeros_like(observation)
+    env_server._draw(observation, slot.state)
+    for tick in range(ticks):
+        env_server._step_slot(slot, rng.randrange(len(DIRECTIONS) + 1), observation)
+        env_server._draw(redrawn, slot.state)
+        stale = np.argwhere(observation != redrawn)
+        if len(stale):
+            return tick, [[int(x) + BOARD.left, int(y) + BOARD.top] for y, x in stale]
+    return None
+
+
+def shrink(seed, actions, engines):
+    """Greedily cut an action list down while it still makes some engine diverge"""
+    failure = replay(seed, actions, engines)
+    actions = list(actions[:failure[0] + 1])
+
+    chunk = max(len(actions) // 2, 1)
+    while chunk >= 1:
+        start = 0
+        while start < len(actions):
+            candidate = actions[:start] + actions[start + chunk:]
+            result = replay(seed, candidate, engines) if candidate else None
+            if result is not None:
+                actions = candidate[:result[0] + 1]
+                failure = result
+            else:
+                start += chunk
+        chunk //= 2
+
+    # Then simplify what is left: drop extra presses, then whole presses
+    for i in range(len(actions)):
+        for simpler in (actions[i][:1], ()):
+            if simpler != actions[i]:
+                candidate = actions[:i] + [simpler] + actions[i + 1:]
+                result = replay(seed, candidate, engines)
+                if result is not None:
+                    actions = candidate
+                    failure = result
+                    break
+    return actions, failure
+
+
+def run_cases(job):
+    """Worker entry point: run a block of cases, return (ticks run, shrunk failures)"""
+    first_case, count, ticks, engines = job
+    rule_engines = [name for name in engines if name in ENGINES]
+    total_ticks = 0
+    failures = []
+    for case in range(first_case, first_case + count):
+        strategy = STRATEGIES[case % len(STRATEGIES)]
+        if rule_engines:
+            actions, failure = generate(case, strategy, ticks, rule_engines)
+            total_ticks += len(actions)
+            if failure is not None:
+                shrunk, failure = shrink(case, actions, rule_engines)
+                failures.append({
+                    "seed": case,
+                    "strategy": strategy,
+                    "engine": failure[1],
+                    "tick": failure[0],
+                    "fields": failure[2],
+                    "actions": [[list(press) for press in presses] for presses in shrunk],
+                })
+        if OBSERVATIONS in engines:
+            stale = check_observations(case, ticks)
+            total_ticks += ticks if stale is None else stale[0] + 1
+            if stale is not None:
+                failures.append({
+                    "seed": case,
+                    "engine": OBSERVATIONS,
+                    "tick": stale[0],
+                    "fields": ["observation"],
+                    "cells": stale[1],
+                })
+    return total_ticks, failures
+
+
+def _default_sigterm():
+    """Undo SDL's SIGTERM handler (installed by pygame.init() when snake_game is imported)"""
+    # Without this a worker ignores Pool.terminate() and `timeout` cannot stop a sweep
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def main(argv=None):
+    _default_sigterm()
+    parser = argparse.ArgumentParser(description="Differential fuzzing of snake engines against snake_game.py")
+    parser.add_argument("--cases", type=int, default=10000, help="number of seeded cases to run")
+    parser.add_argument("--ticks", type=int, default=1000, help="maximum ticks per case")
+    parser.add_argument("--seed", type=int, default=0, help="first case seed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--engine", action="append", choices=sorted(ENGINES) + [OBSERVATIONS],
+                        help="engine to check (default: all)")
+    parser.add_argument("--replay", help="re-run one failure printed by an earlier sweep")
+    args = parser.parse_args(argv)
+    engines = args.engine or sorted(ENGINES) + [OBSERVATIONS]
+
+    if args.replay:
+        case = json.loads(args.replay)
+        if case.get("engine") == OBSERVATIONS:
+            result = check_observations(case["seed"], case["tick"] + 1)
+            print("diverged" if result else "matches", result or "")
+            return 1 if result else 0
+        actions = [tuple(tuple(press) for press in presses) for presses in case["actions"]]
+        result = replay(case["seed"], actions, case.get("engine") and [case["engine"]] or engines)
+        print("diverged" if result else "matches", result or "")
+        return 1 if result else 0
+
+    block = max(1, min(500, args.cases // (args.workers * 4) or 1))
+    jobs = [(start, min(block, args.seed + args.cases - start), args.ticks, engines)
+            for start in range(args.seed, args.seed + args.cases, block)]
+    started = time.perf_counter()
+    total_ticks = 0
+    failures = []
+    # Forking after pygame has started its audio thread can deadlock the workers
+    pool = multiprocessing.get_context("spawn").Pool(args.workers, initializer=_default_sigterm)
+    try:
+        for ticks, found in pool.imap_unordered(run_cases, jobs):
+            total_ticks += ticks
+            for failure in found:
+                failures.append(failure)
+                print(json.dumps(failure), flush=True)
+    except BaseException:
+        pool.terminate()
+        raise
+    # Let the workers finish on their own; terminate() only for a sweep that is being abandoned
+    pool.close()
+    pool.join()
+
+    elapsed = time.perf_counter() - started
+    print(f"{args.cases} cases, {total_ticks} ticks, {len(failures)} failures "
+          f"in {elapsed:.1f}s ({total_ticks / elapsed:.0f} ticks/s)", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
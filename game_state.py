@@ -0,0 +1,276 @@
+"""Headless snake rules with cheap clones, for lookahead agents.
+
+Coordinates are grid cells (pixel // CELL_SIZE), so a reference position of
+(360, 260) is the cell (18, 13). The rules mirror Game.update in
+snake_game.py exactly, including how food positions are drawn. Body
+occupancy is a bitboard (see bitboard.py), so collision and "is this cell
+free" checks are single bit tests.
+"""
+
+from bitboard import BitGrid
+
+# Directions in cells: up, down, left, right
+UP = (0, -1)
+DOWN = (0, 1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+# Everything but the reversal, per heading
+TURNS = {(dx, dy): tuple(d for d in DIRECTIONS if d != (-dx, -dy)) for dx, dy in DIRECTIONS}
+
+MASK_64 = (1 << 64) - 1
+
+# Rebuild a trail once this many dead tail cells have piled up in front of it
+TRAIL_COMPACT_THRESHOLD = 4096
+# Merge a state's chunks into one list once it has this many
+TRAIL_MAX_CHUNKS = 64
+
+
+class Board:
+    """Playfield geometry, built from the same constants as snake_game.py"""
+
+    def __init__(self, game_width=720, game_height=520, cell_size=20, border_width=40):
+        self.cell_size = cell_size
+        self.left = border_width // cell_size
+        self.top = border_width // cell_size
+        # Exclusive wall bounds, see Snake.check_collision
+        self.right = (game_width + border_width - cell_size) // cell_size
+        self.bottom = (game_height + border_width - cell_size) // cell_size
+        # Inclusive pixel ranges used by Food.generate_position
+        self.food_x = (border_width, game_width + border_width - cell_size)
+        self.food_y = (border_width, game_height + border_width - cell_size)
+        self.start = ((game_width // 2) // cell_size, (game_height // 2) // cell_size)
+        self.grid = BitGrid(self.right - self.left, self.bottom - self.top)
+
+    @property
+    def width(self):
+        return self.right - self.left
+
+    @property
+    def height(self):
+        return self.bottom - self.top
+
+    def is_wall(self, cell):
+        return not (self.left <= cell[0] < self.right and self.top <= cell[1] < self.bottom)
+
+    def cell_bit(self, cell):
+        """Bitboard bit for an on-board cell"""
+        return self.grid.bit(cell[0] - self.left, cell[1] - self.top)
+
+    def random_food(self, rng):
+        # Same two randint calls as Food.generate_position, so a shared seed gives the same food
+        x = rng.randint(*self.food_x) // self.cell_size
+        y = rng.randint(*self.food_y) // self.cell_size
+        return (x, y)
+
+
+class SplitMix64:
+    """Tiny RNG whose whole state is one int, so copying it is O(1)"""
+
+    __slots__ = ("state",)
+
+    def __init__(self, seed=0):
+        self.state = seed & MASK_64
+
+    def next(self):
+        self.state = (self.state + 0x9E3779B97F4A7C15) & MASK_64
+        z = self.state
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK_64
+        return z ^ (z >> 31)
+
+    def randint(self, a, b):
+        return a + self.next() % (b - a + 1)
+
+    def clone(self):
+        return SplitMix64(self.state)
+
+
+class GameState:
+    """One game of snake that can be cloned in O(1) and stepped independently.
+
+    The body lives in a trail of head cells, tail first and head last, and
+    its cells are the set bits of the occupancy int. Clones share the trail;
+    whichever clone steps first from the tip keeps appending in place. Any
+    other clone keeps its cells where they are, as a (list, end) chunk, and
+    starts a new list for the cells it adds, so stepping costs O(1) whether
+    or not a sibling got there first. A clone that is never stepped costs a
+    handful of attribute copies.
+
+    The trail is _chunks followed by _trail[:_end], with the tail at index
+    _start of the first of them.
+    """
+
+    __slots__ = ("board", "rng", "direction", "grow", "food", "score", "game_over",
+                 "occupancy", "length", "_chunks", "_trail", "_start", "_end")
+
+    def __init__(self, board=None, rng=None, seed=0):
+        self.board = board if board is not None else Board()
+        self.rng = rng if rng is not None else SplitMix64(seed)
+        self.direction = RIGHT
+        self.grow = False
+        self.score = 0
+        self.game_over = False
+        self._chunks = ()
+        self._trail = [self.board.start]
+        self.occupancy = self.board.cell_bit(self.board.start)
+        self.length = 1
+        self._start = 0
+        self._end = 1
+        # Like Food(), the first food is not checked against the snake
+        self.food = self.board.random_food(self.rng)
+
+    @classmethod
+    def from_game(cls, snake, food, score, board, rng=None):
+        """Build a state from the live Snake/Food objects of snake_game.py"""
+        cell = board.cell_size
+        state = cls.__new__(cls)
+        state.board = board
+        state.rng = rng if rng is not None else SplitMix64()
+        state.direction = (snake.direction[0] // cell, snake.direction[1] // cell)
+        state.grow = snake.grow
+        state.food = (food.position[0] // cell, food.position[1] // cell)
+        state.score = score
+        state.game_over = False
+        state._chunks = ()
+        state._trail = [(x // cell, y // cell) for x, y in reversed(snake.positions)]
+        state.occupancy = 0
+        for position in state._trail:
+            state.occupancy |= board.cell_bit(position)
+        state.length = len(state._trail)
+        state._start = 0
+        state._end = len(state._trail)
+        return state
+
+    def clone(self):
+        other = GameState.__new__(GameState)
+        other.board = self.board
+        other.rng = self.rng.clone()
+        other.direction = self.direction
+        other.grow = self.grow
+        other.food = self.food
+        other.score = self.score
+        other.game_over = self.game_over
+        other.occupancy = self.occupancy
+        other.length = self.length
+        other._chunks = self._chunks
+        other._trail = self._trail
+        other._start = self._start
+        other._end = self._end
+        return other
+
+    @property
+    def head(self):
+        return self._trail[self._end - 1]
+
+    @property
+    def tail(self):
+        if self._chunks:
+            return self._chunks[0][0][self._start]
+        return self._trail[self._start]
+
+    def body(self):
+        """Cells from head to tail, in the same order as Snake.positions"""
+        if not self._chunks:
+            return self._trail[self._end - 1:self._start - 1 if self._start else None:-1]
+        cells = self.tail_cells(self.length)
+        cells.reverse()
+        return cells
+
+    def tail_cells(self, count):
+        """Up to count body cells, starting at the tail"""
+        cells = []
+        start = self._start
+        for trail, end in self._chunks + ((self._trail, self._end),):
+            cells += trail[start:min(end, start + count - len(cells))]
+            if len(cells) == count:
+                break
+            start = 0
+        return cells
+
+    def is_occupied(self, cell):
+        board = self.board
+        return board.grid.test(self.occupancy, cell[0] - board.left, cell[1] - board.top)
+
+    def is_safe(self, cell):
+        """True if moving the head onto cell this tick would not end the game"""
+        if self.board.is_wall(cell):
+            return False
+        # The tail cell is vacated by the same move unless the snake is growing
+        return not self.is_occupied(cell) or (cell == self.tail and not self.grow)
+
+    def reachable_area(self, cell=None, limit=None):
+        """Free cells reachable from cell (the head by default), by bitboard flood fill; at most limit if given"""
+        board = self.board
+        if cell is None:
+            cell = self.head
+        if board.is_wall(cell):
+            return 0
+        return board.grid.reachable_area(cell[0] - board.left, cell[1] - board.top, self.occupancy, limit)
+
+    def legal_directions(self):
+        """Directions change_direction would accept (everything but a reversal)"""
+        return list(TURNS[self.direction])
+
+    def change_direction(self, direction):
+        if (-direction[0], -direction[1]) != self.direction:
+            self.direction = direction
+
+    def step(self, direction=None):
+        """Advance one tick in place, like Game.update with an optional key press"""
+        if self.game_over:
+            return
+        if direction is not None:
+            self.change_direction(direction)
+
+        board = self.board
+        head = self.head
+        self._own()
+        new_head = (head[0] + self.direction[0], head[1] + self.direction[1])
+        self._trail.append(new_head)
+        self._end += 1
+        if self.grow:
+            self.grow = False
+            self.length += 1
+        else:
+            self.occupancy &= ~board.cell_bit(self.tail)
+            self._start += 1
+            if self._chunks and self._start == self._chunks[0][1]:
+                self._chunks = self._chunks[1:]
+                self._start = 0
+
+        hit_wall = board.is_wall(new_head)
+        hit_self = False
+        if not hit_wall:
+            bit = board.cell_bit(new_head)
+            hit_self = self.occupancy & bit != 0
+            self.occupancy |= bit
+
+        if new_head == self.food:
+            self.score += 10
+            self.grow = True
+            # A head in the wall has no bit, so check it by value as well
+            self.food = board.random_food(self.rng)
+            while self.food == new_head or self.is_occupied(self.food):
+                self.food = board.random_food(self.rng)
+
+        if hit_wall or hit_self:
+            self.game_over = True
+
+    def _own(self):
+        """Make sure the next head can be appended to self._trail in place"""
+        trail = self._trail
+        if len(trail) != self._end:
+            # Another clone has already stepped past our head: keep sharing our cells, add ours to a new list
+            self._chunks += ((trail, self._end),)
+            self._trail = []
+            self._end = 0
+            if len(self._chunks) > TRAIL_MAX_CHUNKS:
+                self._trail = self.tail_cells(self.length)
+                self._chunks = ()
+                self._start = 0
+                self._end = len(self._trail)
+        elif not self._chunks and self._start >= TRAIL_COMPACT_THRESHOLD:
+            self._trail = trail[self._start:self._end]
+            self._start = 0
+            self._end = len(self._trail)
@@ -0,0 +1,109 @@
+import queue
+import sqlite3
+import threading
+import time
+
+DEFAULT_DB_PATH = "scores.db"
+
+# How many queued results the writer commits in a single transaction
+WRITE_BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    score INTEGER NOT NULL,
+    agent TEXT NOT NULL,
+    length INTEGER,
+    played_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scores_score ON scores (score DESC);
+CREATE INDEX IF NOT EXISTS idx_scores_agent_score ON scores (agent, score DESC);
+CREATE INDEX IF NOT EXISTS idx_scores_played_at ON scores (played_at);
+"""
+
+
+def _connect(path):
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class Leaderboard:
+    """Persistent score store backed by SQLite in WAL mode.
+
+    Results are queued and written by a background thread, so record() never
+    touches the disk. Reads use their own connection and run concurrently
+    with the writer thanks to WAL.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self.connection = _connect(path)
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="leaderboard-writer", daemon=True)
+        self._writer.start()
+
+    def record(self, score, agent="human", length=None, played_at=None):
+        """Queue one result for writing (safe to call from any thread)"""
+        if played_at is None:
+            played_at = time.time()
+        self._queue.put((score, agent, length, played_at))
+
+    def record_many(self, results, agent="headless"):
+        """Queue (score, length) pairs from a batch run"""
+        played_at = time.time()
+        for score, length in results:
+            self._queue.put((score, agent, length, played_at))
+
+    def top_scores(self, limit=5, agent=None):
+        """Return the best (score, agent, length, played_at) rows, highest first"""
+        if agent is None:
+            cursor = self.connection.execute(
+                "SELECT score, agent, length, played_at FROM scores "
+                "ORDER BY score DESC LIMIT ?", (limit,))
+        else:
+            cursor = self.connection.execute(
+                "SELECT score, agent, length, played_at FROM scores "
+                "WHERE agent = ? ORDER BY score DESC LIMIT ?", (agent, limit))
+        return cursor.fetchall()
+
+    def flush(self):
+        """Block until every queued result has been committed"""
+        self._queue.join()
+
+    def close(self):
+        """Write out pending results and stop the writer thread"""
+        self._queue.put(None)
+        self._writer.join()
+        self.connection.close()
+
+    def _write_loop(self):
+        connection = _connect(self.path)
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            # Drain whatever else is already waiting into the same transaction
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            rows = [row for row in batch if row is not None]
+            running = len(rows) == len(batch)
+            try:
+                if rows:
+                    with connection:
+                        connection.executemany(
+                            "INSERT INTO scores (score, agent, length, played_at) VALUES (?, ?, ?, ?)",
+                            rows)
+            except sqlite3.Error as error:
+                print(f"Leaderboard write failed: {error}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        connection.close()
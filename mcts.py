@@ -0,0 +1,235 @@
+"""Monte Carlo Tree Search autopilot built on game_state.GameState.
+
+The tree is made of GameState clones. Rollouts below the tree do not step
+GameStates at all: they play on a padded copy of the occupancy bitboard
+with integer cell indices, and take the body cells they need from the tail
+of the leaf's trail, so a rollout never touches the shared trail.
+"""
+
+import gc
+import math
+import random
+import time
+
+from game_state import DIRECTIONS
+
+# Rewards seen by the search, per rollout
+FOOD_REWARD = 1.0
+FOOD_DISCOUNT = 0.95  # Food eaten sooner in a rollout is worth more
+DEATH_PENALTY = 1.0
+CLOSENESS_REWARD = 0.1
+
+# Rollout policy: how often to try the move towards the food before a random safe one
+GREEDY = 0.8
+
+
+class Node:
+    # No parent link: the search keeps the path it walked, so a finished tree has no cycles to collect
+    __slots__ = ("state", "direction", "children", "untried", "visits", "value")
+
+    def __init__(self, state, direction=None):
+        self.state = state
+        self.direction = direction
+        self.children = []
+        self.untried = [] if state.game_over else state.legal_directions()
+        self.visits = 0
+        self.value = 0.0
+
+    def best_child(self, exploration):
+        # UCT, as a plain loop: this runs once per tree level on every iteration
+        log_visits = math.log(self.visits)
+        best = None
+        best_score = -math.inf
+        for child in self.children:
+            visits = child.visits
+            score = child.value / visits + exploration * (log_visits / visits) ** 0.5
+            if score > best_score:
+                best = child
+                best_score = score
+        return best
+
+
+class _RolloutGrid:
+    """Board geometry for rollouts: the board's bitboard with a wall row above and below.
+
+    Cell (x, y) is bit (y - board.top + 1) * stride + (x - board.left). Walls, including
+    each row's guard bit, are set in walls, so moving off the board is just
+    another occupied bit, and so is food placed past the wall.
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.width = board.width
+        self.height = board.height
+        self.stride = stride = board.grid.stride
+        size = (board.height + 2) * stride
+        self.walls = ((1 << size) - 1) & ~(board.grid.full << stride)
+        # Index step per direction code, in DIRECTIONS order, and board coordinates per index
+        self.steps = [dy * stride + dx for dx, dy in DIRECTIONS]
+        self.xs = [board.left + i % stride for i in range(size)]
+        self.ys = [board.top - 1 + i // stride for i in range(size)]
+        # Non-reversing direction codes per heading (codes come in opposite pairs, so the reverse is code ^ 1),
+        # in each of three rotations for picking a random order cheaply
+        self.turns = []
+        for code in range(4):
+            forward = [turn for turn in range(4) if turn != code ^ 1]
+            self.turns.append([forward[i:] + forward[:i] for i in range(3)])
+        self.left = board.left
+        self.top = board.top - 1
+
+    def index(self, cell):
+        return (cell[1] - self.top) * self.stride + cell[0] - self.left
+
+
+class MCTSAutopilot:
+    """Picks a direction each tick by running UCT rollouts until the time budget is spent"""
+
+    def __init__(self, time_budget=0.05, rollout_depth=20, exploration=1.0, seed=None):
+        self.time_budget = time_budget
+        self.rollout_depth = rollout_depth
+        self.exploration = exploration
+        self.random = random.Random(seed)
+        self.last_rollouts = 0
+        self._grid = None
+        self._discounts = []
+
+    def choose_direction(self, state):
+        """Return the direction (in cells) to steer state towards"""
+        # The safety fills below come out of the same budget as the search
+        deadline = time.perf_counter() + self.time_budget
+        root = Node(state.clone())
+        root.untried = self.safe_directions(state)
+        rollouts = 0
+
+        # A collection pass over a tree of thousands of nodes can eat a third of the budget
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            while rollouts == 0 or time.perf_counter() < deadline:
+                node = root
+                path = [root]
+                # Selection
+                while not node.untried and node.children:
+                    node = node.best_child(self.exploration)
+                    path.append(node)
+                # Expansion
+                if node.untried:
+                    direction = node.untried.pop(self.random.randrange(len(node.untried)))
+                    child_state = node.state.clone()
+                    child_state.step(direction)
+                    child = Node(child_state, direction)
+                    node.children.append(child)
+                    node = child
+                    path.append(node)
+                # Simulation
+                reward = self.rollout(node.state, state.score)
+                # Backpropagation
+                for node in path:
+                    node.visits += 1
+                    node.value += reward
+                rollouts += 1
+        finally:
+            if collecting:
+                gc.enable()
+
+        self.last_rollouts = rollouts
+        if not root.children:
+            return state.direction
+        return max(root.children, key=lambda child: child.visits).direction
+
+    def safe_directions(self, state):
+        """Legal directions, minus moves into regions too small to hold the snake.
+
+        Each candidate costs one bitboard flood fill, stopped as soon as it has
+        found room for the whole snake. If every move leads into a pocket, keep
+        the roomiest ones and hope the tail opens a way out.
+        """
+        areas = {}
+        for direction in state.legal_directions():
+            after = state.clone()
+            after.step(direction)
+            areas[direction] = -1 if after.game_over else after.reachable_area(limit=state.length)
+        roomy = [d for d, area in areas.items() if area >= state.length]
+        if roomy:
+            return roomy
+        best = max(areas.values())
+        return [d for d, area in areas.items() if area == best]
+
+    def rollout(self, state, base_score):
+        """Play a cheap food-seeking random policy from state and score the outcome"""
+        # Food already eaten on the way down the tree counts in full
+        reward = (state.score - base_score) / 10 * FOOD_REWARD
+        if state.game_over:
+            return reward - DEATH_PENALTY
+
+        grid = self._grid
+        if grid is None or grid.board is not state.board:
+            grid = self._grid = _RolloutGrid(state.board)
+        steps = grid.steps
+        turns = grid.turns
+        xs = grid.xs
+        ys = grid.ys
+        index = grid.index
+        rand = self.random.random
+        depth = self.rollout_depth
+        discounts = self._discounts
+        if len(discounts) != depth:
+            discounts = self._discounts = [FOOD_REWARD * FOOD_DISCOUNT ** (i + 1) for i in range(depth)]
+
+        blocked = (state.occupancy << grid.stride) | grid.walls
+        # Cells the tail will leave, in order: the leaf's body from the tail, then the heads laid down here.
+        # A rollout moves the tail at most depth times, so that many body cells are enough.
+        queue = [index(cell) for cell in state.tail_cells(depth)]
+        tail = 0
+        head = index(state.head)
+        food_x, food_y = state.food
+        food = index((food_x, food_y))
+        direction = DIRECTIONS.index(state.direction)
+        grow = state.grow
+        dead = False
+
+        for step in range(depth):
+            if grow:
+                grow = False
+            else:
+                blocked ^= 1 << queue[tail]
+                tail += 1
+
+            move = -1
+            if rand() < GREEDY:
+                # Close the gap along one axis, picked at random when both are open
+                dx = food_x - xs[head]
+                dy = food_y - ys[head]
+                if dx and (not dy or rand() < 0.5):
+                    move = 3 if dx > 0 else 2
+                elif dy:
+                    move = 1 if dy > 0 else 0
+                if move == direction ^ 1 or move >= 0 and blocked & 1 << head + steps[move]:
+                    move = -1
+            if move < 0:
+                for turn in turns[direction][int(rand() * 3)]:
+                    if not blocked & 1 << head + steps[turn]:
+                        move = turn
+                        break
+                else:
+                    dead = True
+                    break
+
+            direction = move
+            head += steps[move]
+            blocked |= 1 << head
+            queue.append(head)
+            if head == food:
+                reward += discounts[step]
+                grow = True
+                # Any free on-board cell will do for the rest of a rollout
+                while blocked & 1 << food:
+                    food_x = grid.left + int(rand() * grid.width)
+                    food_y = grid.top + 1 + int(rand() * grid.height)
+                    food = index((food_x, food_y))
+
+        if dead:
+            return reward - DEATH_PENALTY
+        board = state.board
+        distance = abs(xs[head] - food_x) + abs(ys[head] - food_y)
+        return reward + CLOSENESS_REWARD * (1 - distance / (board.width + board.height))
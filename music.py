@@ -0,0 +1,138 @@
+"""Streaming procedural background music.
+
+A background thread synthesizes the arcade arpeggio a small chunk at a
+time and queues each chunk onto a mixer channel just before it is needed,
+so only a few chunks ever exist and nothing is generated up front. Tempo,
+pitch and volume can be changed from the game loop at any time; changes are
+ramped across the next chunk and every oscillator keeps its phase between
+chunks, so there are no clicks.
+"""
+
+import threading
+
+import numpy as np
+import pygame
+
+SAMPLE_RATE = 22050
+CHUNK_SECONDS = 0.25
+
+# Arpeggio pattern: A, C, E, G, A, G, E, C (one note per beat)
+MELODY = np.array([220, 261.63, 329.63, 392, 440, 392, 329.63, 261.63])
+BASS_FREQ = 110  # A2
+HARMONY_FREQ = 330  # E4
+BASE_BEATS_PER_SECOND = 1.0
+
+# How the music follows the game
+MAX_TEMPO = 2.0
+TEMPO_PER_SEGMENT = 0.02
+SEGMENTS_PER_SEMITONE = 10
+MAX_SEMITONES = 7
+PAUSED_GAIN = 0.35
+
+# 0.4 * melody + 0.3 * bass + 0.2 * harmony peaks at 0.9; keep the mix moderate like before
+OUTPUT_SCALE = 0.3 / 0.9
+
+
+class MusicStreamer:
+    """Feeds synthesized chunks to a pygame mixer Channel from a background thread"""
+
+    def __init__(self, channel, sample_rate=SAMPLE_RATE, chunk_seconds=CHUNK_SECONDS):
+        self.channel = channel
+        self.sample_rate = sample_rate
+        self.chunk_frames = int(sample_rate * chunk_seconds)
+        self.chunk_seconds = self.chunk_frames / sample_rate
+
+        self.volume = channel.get_volume()
+
+        # Targets set by the game loop (plain attribute writes, read once per chunk)
+        self.tempo = 1.0
+        self.pitch = 1.0
+        self.gain = 1.0
+
+        # Synth state carried from chunk to chunk
+        self._beat = 0.0
+        self._time = 0.0
+        self._melody_phase = 0.0
+        self._bass_phase = 0.0
+        self._harmony_phase = 0.0
+        self._last_tempo = 1.0
+        self._last_pitch = 1.0
+        self._last_gain = 1.0
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="music-streamer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.channel.stop()
+
+    def set_volume(self, volume):
+        """Channel volume, e.g. 0 to mute; kept across chunks"""
+        self.volume = volume
+        self.channel.set_volume(volume)
+
+    def follow(self, length, paused=False):
+        """Speed up and raise the pitch as the snake grows; soften while paused"""
+        self.tempo = min(1.0 + (length - 1) * TEMPO_PER_SEGMENT, MAX_TEMPO)
+        semitones = min((length - 1) // SEGMENTS_PER_SEMITONE, MAX_SEMITONES)
+        self.pitch = 2 ** (semitones / 12)
+        self.gain = PAUSED_GAIN if paused else 1.0
+
+    def synthesize_chunk(self):
+        """Render the next chunk as a C-contiguous stereo int16 array"""
+        frames = self.chunk_frames
+        ramp = np.arange(1, frames + 1) / frames
+
+        # Ramp each parameter from where the last chunk ended to its new target
+        tempo, pitch, gain = self.tempo, self.pitch, self.gain
+        tempo_curve = self._last_tempo + (tempo - self._last_tempo) * ramp
+        pitch_curve = self._last_pitch + (pitch - self._last_pitch) * ramp
+        gain_curve = self._last_gain + (gain - self._last_gain) * ramp
+        self._last_tempo, self._last_pitch, self._last_gain = tempo, pitch, gain
+
+        beat_step = tempo_curve * (BASE_BEATS_PER_SECOND / self.sample_rate)
+        beats = self._beat + np.cumsum(beat_step) - beat_step
+        self._beat = float(beats[-1] + beat_step[-1]) % len(MELODY)
+
+        note = beats.astype(np.int64) % len(MELODY)
+        # Seconds since the current note started, for the per-note decay
+        since_note = (beats - np.floor(beats)) / (tempo_curve * BASE_BEATS_PER_SECOND)
+
+        two_pi_over_rate = 2 * np.pi / self.sample_rate
+        melody_phase = self._melody_phase + np.cumsum(MELODY[note] * pitch_curve * two_pi_over_rate)
+        bass_phase = self._bass_phase + np.cumsum(BASS_FREQ * pitch_curve * two_pi_over_rate)
+        harmony_phase = self._harmony_phase + np.cumsum(HARMONY_FREQ * pitch_curve * two_pi_over_rate)
+        self._melody_phase = float(melody_phase[-1]) % (2 * np.pi)
+        self._bass_phase = float(bass_phase[-1]) % (2 * np.pi)
+        self._harmony_phase = float(harmony_phase[-1]) % (2 * np.pi)
+
+        melody = np.sin(melody_phase) * np.exp(-since_note * 2)
+        bass = 0.3 * np.sin(bass_phase)
+        harmony = 0.2 * np.sin(harmony_phase)
+        music = 0.4 * melody + bass + harmony
+
+        # Slow swell so it is less harsh
+        t = self._time + np.arange(frames) / self.sample_rate
+        self._time = (self._time + self.chunk_seconds) % 2.0
+        music *= (0.8 + 0.2 * np.sin(0.5 * 2 * np.pi * t)) * gain_curve
+
+        music = (music * OUTPUT_SCALE * 32767).astype(np.int16)
+        return np.ascontiguousarray(np.column_stack((music, music)))
+
+    def _run(self):
+        pending = pygame.sndarray.make_sound(self.synthesize_chunk())
+        while not self._stop.is_set():
+            if not self.channel.get_busy():
+                self.channel.play(pending)
+                self.channel.set_volume(self.volume)
+            elif self.channel.get_queue() is None:
+                self.channel.queue(pending)
+            else:
+                # Both slots are full; check again well before the playing chunk ends
+                self._stop.wait(self.chunk_seconds / 4)
+                continue
+            pending = pygame.sndarray.make_sound(self.synthesize_chunk())
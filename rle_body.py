@@ -0,0 +1,160 @@
+"""Run-length encoded snake body for very long snakes on very large boards.
+
+Instead of one (x, y) tuple per segment, the body is a deque of
+(direction, length) runs from head to tail, plus a one-bit-per-cell
+occupancy bitmap for O(1) collision checks. Cells are only expanded when
+something asks for them, e.g. the part of the body inside a viewport.
+Coordinates are grid cells, as in game_state.py.
+"""
+
+import sys
+from collections import deque
+
+from game_state import DIRECTIONS, RIGHT
+
+
+class RunLengthBody:
+    """Body cells as runs of moves; runs[0] ends at the head, runs[-1] starts at the tail"""
+
+    __slots__ = ("board", "head", "tail", "length", "runs", "bitmap")
+
+    def __init__(self, board, head):
+        self.board = board
+        self.head = head
+        self.tail = head
+        self.length = 1
+        # (index into DIRECTIONS, number of moves) pairs
+        self.runs = deque()
+        self.bitmap = bytearray((board.width * board.height + 7) // 8)
+        self._set(head)
+
+    def _index(self, cell):
+        board = self.board
+        return (cell[1] - board.top) * board.width + (cell[0] - board.left)
+
+    def _set(self, cell):
+        index = self._index(cell)
+        self.bitmap[index >> 3] |= 1 << (index & 7)
+
+    def _clear(self, cell):
+        index = self._index(cell)
+        self.bitmap[index >> 3] &= ~(1 << (index & 7))
+
+    def __len__(self):
+        return self.length
+
+    def __contains__(self, cell):
+        board = self.board
+        if board.is_wall(cell):
+            return False
+        index = self._index(cell)
+        return self.bitmap[index >> 3] >> (index & 7) & 1 == 1
+
+    def advance(self, direction, grow=False):
+        """Move the head one cell, dropping the tail cell unless growing.
+
+        Returns True if the new head lands on the body. As in Snake.move, the
+        tail leaves before the collision check, so following it is fine. A
+        head pushed into the wall is kept in the runs but has no bitmap bit.
+        """
+        if not grow:
+            self._clear(self.tail)
+        head = (self.head[0] + direction[0], self.head[1] + direction[1])
+        hit_self = head in self
+
+        code = DIRECTIONS.index(direction)
+        runs = self.runs
+        if runs and runs[0][0] == code:
+            runs[0] = (code, runs[0][1] + 1)
+        else:
+            runs.appendleft((code, 1))
+        self.head = head
+        if not self.board.is_wall(head):
+            self._set(head)
+
+        if grow:
+            self.length += 1
+        else:
+            code, count = runs[-1]
+            dx, dy = DIRECTIONS[code]
+            self.tail = (self.tail[0] + dx, self.tail[1] + dy)
+            if count == 1:
+                runs.pop()
+            else:
+                runs[-1] = (code, count - 1)
+        return hit_self
+
+    def cells(self):
+        """Yield every cell from head to tail"""
+        x, y = self.head
+        yield (x, y)
+        for code, count in self.runs:
+            dx, dy = DIRECTIONS[code]
+            for _ in range(count):
+                x -= dx
+                y -= dy
+                yield (x, y)
+
+    def visible_cells(self, left, top, right, bottom):
+        """Yield the body cells inside [left, right) x [top, bottom), head first.
+
+        Runs are straight, so each run is clipped to the rectangle in O(1) and
+        only the cells that are actually visible get expanded.
+        """
+        x, y = self.head
+        if left <= x < right and top <= y < bottom:
+            yield (x, y)
+        for code, count in self.runs:
+            dx, dy = DIRECTIONS[code]
+            # Cell k of the run (1 <= k <= count) is (x - dx * k, y - dy * k)
+            first, last = 1, count
+            for position, step, low, high in ((x, dx, left, right), (y, dy, top, bottom)):
+                if step == 0:
+                    if not low <= position < high:
+                        last = 0
+                elif step > 0:
+                    first = max(first, position - high + 1)
+                    last = min(last, position - low)
+                else:
+                    first = max(first, low - position)
+                    last = min(last, high - position - 1)
+            for k in range(first, last + 1):
+                yield (x - dx * k, y - dy * k)
+            x -= dx * count
+            y -= dy * count
+
+    def memory_bytes(self):
+        """Approximate bytes held by this body (runs and bitmap)"""
+        runs = self.runs
+        size = sys.getsizeof(runs) + sys.getsizeof(self.bitmap)
+        if runs:
+            size += len(runs) * sys.getsizeof(runs[0])
+        return size
+
+
+class CompactSnake:
+    """Cell-based counterpart of snake_game.Snake, backed by a RunLengthBody"""
+
+    __slots__ = ("body", "direction", "grow", "_hit_self")
+
+    def __init__(self, board, head=None):
+        self.body = RunLengthBody(board, head if head is not None else board.start)
+        self.direction = RIGHT
+        self.grow = False
+        self._hit_self = False
+
+    @property
+    def head(self):
+        return self.body.head
+
+    def move(self):
+        self._hit_self = self.body.advance(self.direction, self.grow)
+        self.grow = False
+
+    def change_direction(self, direction):
+        # Prevent moving in opposite direction
+        if (-direction[0], -direction[1]) != self.direction:
+            self.direction = direction
+
+    def check_collision(self):
+        return self.body.board.is_wall(self.body.head) or self._hit_self
@@ -0,0 +1,99 @@
+"""Deadline-based tick scheduling with a difficulty speed curve.
+
+Ticks are scheduled against time.perf_counter deadlines: each deadline is
+the previous one plus the current period, never "now plus a period", so
+rounding and late wake-ups do not add up into drift. Waiting sleeps until
+shortly before the deadline and spins the rest of the way, which holds
+timing to well under a millisecond even above 60 ticks per second.
+"""
+
+import time
+from collections import deque
+
+
+class SpeedCurve:
+    """Piecewise-linear ticks per second as a function of snake length (or score)"""
+
+    def __init__(self, points):
+        self.points = sorted(points)
+
+    def __call__(self, x):
+        points = self.points
+        if x <= points[0][0]:
+            return points[0][1]
+        for (x0, y0), (x1, y1) in zip(points, points[1:]):
+            if x <= x1:
+                return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+        return points[-1][1]
+
+
+def wait_until(deadline, spin=0.002):
+    """Sleep until just before deadline, then busy-wait for the last few milliseconds"""
+    remaining = deadline - time.perf_counter()
+    if remaining > spin:
+        time.sleep(remaining - spin)
+    while time.perf_counter() < deadline:
+        pass
+
+
+class TickScheduler:
+    """Hands out ticks at a (changeable) rate and measures how late each one starts"""
+
+    def __init__(self, rate, max_catch_up=5, history=10000):
+        self.rate = rate
+        self.period = 1.0 / rate
+        self.max_catch_up = max_catch_up
+        self.next_deadline = None
+        self.ticks = 0
+        self.dropped = 0
+        self.max_lateness = 0.0
+        self._total_lateness = 0.0
+        self._recent = deque(maxlen=history)
+
+    def set_rate(self, rate):
+        """Change the rate; the pending deadline moves to last deadline plus the new period"""
+        if rate == self.rate:
+            return
+        period = 1.0 / rate
+        if self.next_deadline is not None:
+            self.next_deadline += period - self.period
+        self.rate = rate
+        self.period = period
+
+    def due(self, now=None):
+        """Number of ticks whose deadline has passed; call once per loop and run that many"""
+        if now is None:
+            now = time.perf_counter()
+        if self.next_deadline is None:
+            self.next_deadline = now
+
+        count = 0
+        while now >= self.next_deadline and count < self.max_catch_up:
+            lateness = now - self.next_deadline
+            self.ticks += 1
+            self._total_lateness += lateness
+            self.max_lateness = max(self.max_lateness, lateness)
+            self._recent.append(lateness)
+            self.next_deadline += self.period
+            count += 1
+
+        if now >= self.next_deadline:
+            # Too far behind (e.g. the window was dragged); skip the backlog instead of racing through it
+            skipped = int((now - self.next_deadline) / self.period) + 1
+            self.dropped += skipped
+            self.next_deadline += skipped * self.period
+        return count
+
+    def jitter(self):
+        """Tick lateness in milliseconds: mean and max overall, p99 over recent ticks"""
+        if not self.ticks:
+            return {"ticks": 0, "dropped": self.dropped, "mean_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        recent = sorted(self._recent)
+        p99 = recent[min(len(recent) - 1, int(len(recent) * 0.99))]
+        return {
+            "ticks": self.ticks,
+            "dropped": self.dropped,
+            "mean_ms": self._total_lateness / self.ticks * 1000,
+            "p99_ms": p99 * 1000,
+            "max_ms": self.max_lateness * 1000,
+        }
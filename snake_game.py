@@ -1,8 +1,15 @@
 import pygame
 import random
 import sys
+import sqlite3
 import numpy as np
 
+from game_state import Board, GameState
+from leaderboard import Leaderboard
+from mcts import MCTSAutopilot
+from music import MusicStreamer
+from scheduler import SpeedCurve, TickScheduler, wait_until
+
 # Initialize Pygame
 pygame.init()
 pygame.mixer.init(frequency=22050, size=-16, channels=2, buffer=512)
@@ -25,7 +32,24 @@ DARK_BLUE = (0, 100, 150)
 GLOW_BLUE = (100, 200, 255)
 
 # Game variables
-FPS = 10
+FPS = 10  # Starting ticks per second; SPEED_CURVE takes over as the snake grows
+RENDER_FPS = 60
+HIGH_SCORE_COUNT = 3
+AUTOPILOT_SHARE = 0.5  # Share of each tick the autopilot may spend searching
+
+# Ticks per second by snake length; raise the later points for high-speed modes
+SPEED_CURVE = SpeedCurve([(1, FPS), (10, 13), (25, 18), (50, 25), (100, 40)])
+
+# Sprite glow sizes in pixels
+SPRITE_GLOW = 2
+BUTTON_GLOW = 8
+
+# Button look per state: border color, text color, glow rings
+BUTTON_STYLES = {
+    "normal": (NEON_BLUE, NEON_BLUE, 4),
+    "hovered": (NEON_PINK, WHITE, 6),
+    "clicked": (WHITE, NEON_PINK, 8),
+}
 
 class Button:
     def __init__(self, x, y, width, height, text, font, action=None):
@@ -45,20 +69,12 @@ class Button:
                 return True
         return False
     
-    def draw(self, screen):
-        # Button colors based on state
-        if self.clicked:
-            border_color = WHITE
-            text_color = NEON_PINK
-            glow_intensity = 8
-        elif self.hovered:
-            border_color = NEON_PINK
-            text_color = WHITE
-            glow_intensity = 6
-        else:
-            border_color = NEON_BLUE
-            text_color = NEON_BLUE
-            glow_intensity = 4
+    def render(self, state):
+        """Render this button in one state ("normal", "hovered" or "clicked") with its glow"""
+        border_color, text_color, glow_intensity = BUTTON_STYLES[state]
+        surface = pygame.Surface((self.rect.width + BUTTON_GLOW * 2, self.rect.height + BUTTON_GLOW * 2),
+                                 pygame.SRCALPHA)
+        rect = pygame.Rect(BUTTON_GLOW, BUTTON_GLOW, self.rect.width, self.rect.height)
         
         # Draw glowing border effect
         for i in range(glow_intensity):
@@ -67,28 +83,75 @@ class Button:
                 glow_color = (border_color[0] * intensity // 255, 
                              border_color[1] * intensity // 255, 
                              border_color[2] * intensity // 255)
-                pygame.draw.rect(screen, glow_color, 
-                               (self.rect.x - i, self.rect.y - i,
-                                self.rect.width + i * 2, self.rect.height + i * 2), 2)
+                pygame.draw.rect(surface, glow_color, 
+                               (rect.x - i, rect.y - i,
+                                rect.width + i * 2, rect.height + i * 2), 2)
         
         # Draw button background
-        pygame.draw.rect(screen, BLACK, self.rect)
-        pygame.draw.rect(screen, border_color, self.rect, 3)
+        pygame.draw.rect(surface, BLACK, rect)
+        pygame.draw.rect(surface, border_color, rect, 3)
         
         # Draw text with glow effect
         text_surface = self.font.render(self.text, True, text_color)
-        if self.hovered or self.clicked:
+        if state != "normal":
             glow_surface = self.font.render(self.text, True, WHITE)
-            glow_rect = glow_surface.get_rect(center=(self.rect.centerx + 1, self.rect.centery + 1))
-            screen.blit(glow_surface, glow_rect)
+            glow_rect = glow_surface.get_rect(center=(rect.centerx + 1, rect.centery + 1))
+            surface.blit(glow_surface, glow_rect)
         
-        text_rect = text_surface.get_rect(center=self.rect.center)
-        screen.blit(text_surface, text_rect)
+        text_rect = text_surface.get_rect(center=rect.center)
+        surface.blit(text_surface, text_rect)
+        return surface.convert_alpha()
+    
+    def draw(self, screen, atlas):
+        if self.clicked:
+            state = "clicked"
+        elif self.hovered:
+            state = "hovered"
+        else:
+            state = "normal"
+        screen.blit(atlas.button(self, state), (self.rect.x - BUTTON_GLOW, self.rect.y - BUTTON_GLOW))
         
         # Reset clicked state
         if self.clicked:
             self.clicked = False
 
+class SpriteAtlas:
+    """Sprites for the snake, food and buttons, rendered once and blitted every frame"""
+    
+    def __init__(self):
+        # Needs the display mode to be set for convert()
+        glow_size = CELL_SIZE + SPRITE_GLOW * 2
+        cell = (SPRITE_GLOW, SPRITE_GLOW, CELL_SIZE, CELL_SIZE)
+        
+        self.head = pygame.Surface((glow_size, glow_size)).convert()
+        self.head.fill(GLOW_BLUE)
+        self.head.fill(NEON_BLUE, cell)
+        
+        # Body bars as long as the playfield; a straight run of segments is one slice of a bar
+        self.body_horizontal = pygame.Surface((GAME_WIDTH, CELL_SIZE)).convert()
+        self.body_horizontal.fill(BRIGHT_GREEN)
+        self.body_vertical = pygame.Surface((CELL_SIZE, GAME_HEIGHT)).convert()
+        self.body_vertical.fill(BRIGHT_GREEN)
+        
+        self.food = pygame.Surface((glow_size, glow_size)).convert()
+        self.food.fill(NEON_PINK)
+        self.food.fill(WHITE, cell)
+        
+        self.buttons = {}
+    
+    def button(self, button, state):
+        """Sprite for a button state, rendered the first time it is asked for"""
+        key = (button.text, button.rect.size, id(button.font), state)
+        sprite = self.buttons.get(key)
+        if sprite is None:
+            sprite = self.buttons[key] = button.render(state)
+        return sprite
+    
+    def blit_all(self, screen, sprites):
+        """Blit a list of (surface, position[, area]) tuples in one call"""
+        # Not fblits: where it exists (pygame-ce) it only takes (surface, position) pairs
+        screen.blits(sprites, doreturn=False)
+
 class Snake:
     def __init__(self):
         self.positions = [(GAME_WIDTH // 2, GAME_HEIGHT // 2)]
@@ -124,18 +187,34 @@ class Snake:
         
         return False
     
-    def draw(self, screen):
-        for i, pos in enumerate(self.positions):
-            # Draw snake body with glow effect
-            if i == 0:  # Head
-                # Draw glow
-                pygame.draw.rect(screen, GLOW_BLUE, 
-                               (pos[0] - 2, pos[1] - 2, CELL_SIZE + 4, CELL_SIZE + 4))
-                pygame.draw.rect(screen, NEON_BLUE, 
-                               (pos[0], pos[1], CELL_SIZE, CELL_SIZE))
-            else:  # Body
-                pygame.draw.rect(screen, BRIGHT_GREEN, 
-                               (pos[0], pos[1], CELL_SIZE, CELL_SIZE))
+    def draw(self, screen, atlas):
+        positions = self.positions
+        head = positions[0]
+        # Head glow first so the neighbouring body segment covers its edge
+        sprites = [(atlas.head, (head[0] - SPRITE_GLOW, head[1] - SPRITE_GLOW))]
+        
+        # One blit per straight run of body segments instead of one per segment
+        i = 1
+        while i < len(positions):
+            x, y = positions[i]
+            j = i + 1
+            if j < len(positions):
+                dx = positions[j][0] - x
+                dy = positions[j][1] - y
+                last_x, last_y = x, y
+                while j < len(positions) and positions[j] == (last_x + dx, last_y + dy):
+                    last_x, last_y = positions[j]
+                    j += 1
+            end_x, end_y = positions[j - 1]
+            if end_y == y:
+                sprite = atlas.body_horizontal
+            else:
+                sprite = atlas.body_vertical
+            area = (0, 0, abs(end_x - x) + CELL_SIZE, abs(end_y - y) + CELL_SIZE)
+            sprites.append((sprite, (min(x, end_x), min(y, end_y)), area))
+            i = j
+        
+        atlas.blit_all(screen, sprites)
 
 class Food:
     def __init__(self):
@@ -149,19 +228,16 @@ class Food:
         y = (y // CELL_SIZE) * CELL_SIZE
         return (x, y)
     
-    def draw(self, screen):
-        # Draw food with pulsing glow effect
-        pygame.draw.rect(screen, NEON_PINK, 
-                        (self.position[0] - 2, self.position[1] - 2, 
-                         CELL_SIZE + 4, CELL_SIZE + 4))
-        pygame.draw.rect(screen, WHITE, 
-                        (self.position[0], self.position[1], CELL_SIZE, CELL_SIZE))
+    def draw(self, screen, atlas):
+        screen.blit(atlas.food, (self.position[0] - SPRITE_GLOW, self.position[1] - SPRITE_GLOW))
 
 class Game:
     def __init__(self):
         self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
         pygame.display.set_caption("NEON SNAKE")
-        self.clock = pygame.time.Clock()
+        self.tick_scheduler = TickScheduler(FPS)
+        self.frame_scheduler = TickScheduler(RENDER_FPS, max_catch_up=1)
+        self.atlas = SpriteAtlas()
         self.font_large = pygame.font.Font(None, 48)
         self.font_medium = pygame.font.Font(None, 36)
         self.font_small = pygame.font.Font(None, 24)
@@ -172,10 +248,35 @@ class Game:
         self.pause_menu_selection = 0  # 0: Resume, 1: Mute/Unmute, 2: Main Menu
         self.mouse_pos = (0, 0)
         self.buttons = []
+        self.high_scores = []
+        self.board = Board(GAME_WIDTH, GAME_HEIGHT, CELL_SIZE, BORDER_WIDTH)
+        self.autopilot = MCTSAutopilot(time_budget=AUTOPILOT_SHARE / FPS)
+        self.autopilot_enabled = False
+        self.load_leaderboard()
         self.load_sounds()
         self.start_background_music()
         self.reset_game()
     
+    def load_leaderboard(self):
+        """Open the persistent score store"""
+        try:
+            self.leaderboard = Leaderboard()
+        except sqlite3.Error:
+            # Play on without saving scores if the database can't be opened
+            self.leaderboard = None
+    
+    def record_score(self):
+        """Save the final score and refresh the high scores shown on game over"""
+        if self.leaderboard is None:
+            self.high_scores = [self.score]
+            return
+        
+        # The write happens on the leaderboard thread, so merge this score in locally
+        best = [row[0] for row in self.leaderboard.top_scores(HIGH_SCORE_COUNT)]
+        agent = "mcts" if self.autopilot_enabled else "human"
+        self.leaderboard.record(self.score, agent=agent, length=len(self.snake.positions))
+        self.high_scores = sorted(best + [self.score], reverse=True)[:HIGH_SCORE_COUNT]
+    
     def load_sounds(self):
         """Load or generate sound effects"""
         try:
@@ -247,57 +348,6 @@ class Game:
         sound = pygame.sndarray.make_sound(stereo_wave)
         return sound
     
-    def generate_background_music(self):
-        """Generate arcade-style background music"""
-        duration = 8.0  # 8 seconds loop
-        sample_rate = 22050
-        frames = int(duration * sample_rate)
-        
-        t = np.linspace(0, duration, frames, False)
-        
-        # Create a simple arcade melody with multiple harmonics
-        # Main melody line
-        melody_freq = 220  # A3 base frequency
-        melody = np.sin(melody_freq * 2 * np.pi * t)
-        
-        # Add some variation - simple arpeggio pattern
-        pattern_length = duration / 8  # 8 notes in the loop
-        for i in range(8):
-            start_time = i * pattern_length
-            end_time = (i + 1) * pattern_length
-            
-            # Create frequency pattern: A, C, E, G, A, G, E, C
-            frequencies = [220, 261.63, 329.63, 392, 440, 392, 329.63, 261.63]
-            freq = frequencies[i]
-            
-            # Apply frequency to the time segment
-            mask = (t >= start_time) & (t < end_time)
-            melody[mask] = np.sin(freq * 2 * np.pi * t[mask]) * np.exp(-(t[mask] - start_time) * 2)
-        
-        # Add bass line
-        bass_freq = 110  # A2
-        bass = 0.3 * np.sin(bass_freq * 2 * np.pi * t)
-        
-        # Add some harmony
-        harmony = 0.2 * np.sin(330 * 2 * np.pi * t)  # E4
-        
-        # Combine all parts
-        music = 0.4 * melody + bass + harmony
-        
-        # Apply overall envelope to make it less harsh
-        envelope = 0.8 + 0.2 * np.sin(0.5 * 2 * np.pi * t)
-        music = music * envelope
-        
-        # Normalize and convert to 16-bit
-        music = music / np.max(np.abs(music)) * 0.3  # Keep volume moderate
-        music = (music * 32767).astype(np.int16)
-        
-        # Make stereo and ensure C-contiguous
-        stereo_music = np.column_stack((music, music)).astype(np.int16)
-        stereo_music = np.ascontiguousarray(stereo_music)
-        
-        return stereo_music
-    
     def start_background_music(self):
         """Start playing background music"""
         try:
@@ -307,15 +357,11 @@ class Game:
             pygame.mixer.music.play(-1)  # Loop indefinitely
             self.using_pygame_music = True
         except (pygame.error, FileNotFoundError):
-            # Generate and play synthetic background music
-            music_array = self.generate_background_music()
-            music_sound = pygame.sndarray.make_sound(music_array)
-            
-            # Use a dedicated channel for looping the generated sound
+            # Stream synthetic background music that follows the game
             self.music_channel = pygame.mixer.Channel(7)  # Use channel 7 for music
-            self.background_music_sound = music_sound
-            self.music_channel.play(music_sound, loops=-1)
             self.music_channel.set_volume(0.3)
+            self.music_streamer = MusicStreamer(self.music_channel)
+            self.music_streamer.start()
             self.using_pygame_music = False
     
     def toggle_music(self):
@@ -326,14 +372,14 @@ class Game:
             # Stop/mute the music
             if hasattr(self, 'using_pygame_music') and self.using_pygame_music:
                 pygame.mixer.music.set_volume(0)
-            elif hasattr(self, 'music_channel'):
-                self.music_channel.set_volume(0)
+            elif hasattr(self, 'music_streamer'):
+                self.music_streamer.set_volume(0)
         else:
             # Resume/unmute the music
             if hasattr(self, 'using_pygame_music') and self.using_pygame_music:
                 pygame.mixer.music.set_volume(0.3)
-            elif hasattr(self, 'music_channel'):
-                self.music_channel.set_volume(0.3)
+            elif hasattr(self, 'music_streamer'):
+                self.music_streamer.set_volume(0.3)
     
     def reset_game(self):
         self.snake = Snake()
@@ -378,7 +424,7 @@ class Game:
         
         # Draw buttons
         for button in self.buttons:
-            button.draw(self.screen)
+            button.draw(self.screen, self.atlas)
         
         # Footer
         footer_text = self.font_tiny.render("Use mouse to click buttons or press ESC to quit", True, DARK_BLUE)
@@ -576,7 +622,7 @@ class Game:
         if not hasattr(self, 'back_button'):
             self.back_button = Button(WINDOW_WIDTH // 2 - 75, WINDOW_HEIGHT - 100, 150, 40, "BACK TO MENU", self.font_small, "back")
         
-        self.back_button.draw(self.screen)
+        self.back_button.draw(self.screen, self.atlas)
     
     def draw_border(self):
         # Draw outer glow border
@@ -626,6 +672,11 @@ class Game:
         # Draw pause instruction
         pause_text = self.font_tiny.render("P: PAUSE", True, DARK_BLUE)
         self.screen.blit(pause_text, (WINDOW_WIDTH - 80, 20))
+        
+        # Show when the AI is driving
+        if self.autopilot_enabled:
+            autopilot_text = self.font_tiny.render("AUTOPILOT", True, BRIGHT_GREEN)
+            self.screen.blit(autopilot_text, (WINDOW_WIDTH - 80, 5))
     
     def draw_game_over(self):
         # Semi-transparent overlay
@@ -649,6 +700,13 @@ class Game:
         final_score_rect = final_score_text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 - 70))
         self.screen.blit(final_score_text, final_score_rect)
         
+        # High scores from the leaderboard
+        if self.high_scores:
+            best_text = "HIGH SCORES: " + "   ".join(str(score) for score in self.high_scores)
+            high_score_text = self.font_small.render(best_text, True, BRIGHT_GREEN)
+            high_score_rect = high_score_text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 175))
+            self.screen.blit(high_score_text, high_score_rect)
+        
         # Create game over buttons if they don't exist
         if not hasattr(self, 'game_over_buttons'):
             self.game_over_buttons = [
@@ -659,7 +717,7 @@ class Game:
         
         # Draw buttons
         for button in self.game_over_buttons:
-            button.draw(self.screen)
+            button.draw(self.screen, self.atlas)
     
     def handle_events(self):
         self.mouse_pos = pygame.mouse.get_pos()
@@ -704,6 +762,9 @@ class Game:
                         elif event.key == pygame.K_p or event.key == pygame.K_SPACE:
                             self.game_state = "paused"
                             self.pause_menu_selection = 0
+                        elif event.key == pygame.K_i:
+                            self.autopilot_enabled = not self.autopilot_enabled
+                            self.menu_sound.play()
                     else:
                         # Game over keyboard shortcuts
                         if event.key == pygame.K_SPACE:
@@ -773,7 +834,13 @@ class Game:
         return True
     
     def update(self):
+        if hasattr(self, 'music_streamer'):
+            self.music_streamer.follow(len(self.snake.positions), paused=self.game_state == "paused")
+        
         if self.game_state == "playing" and not self.game_over:
+            if self.autopilot_enabled:
+                self.steer_autopilot()
+            
             self.snake.move()
             
             # Check collision with food
@@ -791,6 +858,13 @@ class Game:
             if self.snake.check_collision():
                 self.game_over = True
                 self.game_over_sound.play()  # Play game over sound
+                self.record_score()
+    
+    def steer_autopilot(self):
+        """Let the MCTS autopilot pick this tick's direction"""
+        state = GameState.from_game(self.snake, self.food, self.score, self.board)
+        direction = self.autopilot.choose_direction(state)
+        self.snake.change_direction((direction[0] * CELL_SIZE, direction[1] * CELL_SIZE))
     
     def draw(self):
         if self.game_state == "start_menu":
@@ -816,8 +890,8 @@ class Game:
             
             if not self.game_over:
                 # Draw game objects
-                self.snake.draw(self.screen)
-                self.food.draw(self.screen)
+                self.snake.draw(self.screen, self.atlas)
+                self.food.draw(self.screen, self.atlas)
             else:
                 # Draw game over screen
                 self.draw_game_over()
@@ -830,14 +904,21 @@ class Game:
             self.screen.fill(BLACK)
             self.draw_border()
             self.draw_ui()
-            self.snake.draw(self.screen)
-            self.food.draw(self.screen)
+            self.snake.draw(self.screen, self.atlas)
+            self.food.draw(self.screen, self.atlas)
             
             # Draw pause menu overlay
             self.draw_pause_menu()
         
         pygame.display.flip()
     
+    def report_timing(self):
+        """Print how closely simulation ticks kept to their deadlines"""
+        jitter = self.tick_scheduler.jitter()
+        print(f"Tick timing: {jitter['ticks']} ticks, {jitter['dropped']} dropped, "
+              f"late by {jitter['mean_ms']:.2f} ms on average "
+              f"(p99 {jitter['p99_ms']:.2f} ms, max {jitter['max_ms']:.2f} ms)")
+    
     def run(self):
         running = True
         
@@ -854,10 +935,23 @@ class Game:
         
         while running:
             running = self.handle_events()
-            self.update()
-            self.draw()
-            self.clock.tick(FPS)
+            
+            # Simulation ticks follow their own deadlines, separate from the frame rate
+            for _ in range(self.tick_scheduler.due()):
+                self.update()
+            self.tick_scheduler.set_rate(SPEED_CURVE(len(self.snake.positions)))
+            self.autopilot.time_budget = AUTOPILOT_SHARE * self.tick_scheduler.period
+            
+            if self.frame_scheduler.due():
+                self.draw()
+            
+            wait_until(min(self.tick_scheduler.next_deadline, self.frame_scheduler.next_deadline))
         
+        self.report_timing()
+        if hasattr(self, 'music_streamer'):
+            self.music_streamer.stop()
+        if self.leaderboard is not None:
+            self.leaderboard.close()
         pygame.quit()
         sys.exit()
 